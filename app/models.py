@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, ForeignKeyConstraint, Index, Boolean
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -46,8 +46,15 @@ class Enrollment(Base):
 
 class Topic(Base):
     __tablename__ = "topics"
+    # List-partitioned by semester on Postgres; the partition key has to be
+    # part of the primary key, so it is copied down from Course.semester.
+    __table_args__ = (
+        Index("ix_topics_semester_course", "semester", "course_id"),
+        {"postgresql_partition_by": "LIST (semester)"},
+    )
     
     topic_id = Column(Integer, primary_key=True)
+    semester = Column(String(10), primary_key=True)
     topic_title = Column(String(200), nullable=False)
     topic_content = Column(Text, nullable=False)
     topic_created_at = Column(DateTime, nullable=False)
@@ -63,20 +70,34 @@ class Topic(Base):
 
 class Entry(Base):
     __tablename__ = "entries"
+    __table_args__ = (
+        ForeignKeyConstraint(["topic_id", "semester"], ["topics.topic_id", "topics.semester"]),
+        Index("ix_entries_semester_topic", "semester", "topic_id"),
+        {"postgresql_partition_by": "LIST (semester)"},
+    )
     
     entry_id = Column(Integer, primary_key=True)
+    semester = Column(String(10), primary_key=True)
     entry_content = Column(Text, nullable=False)
     entry_created_at = Column(DateTime, nullable=False)
     entry_deleted_at = Column(DateTime, nullable=True)
     entry_state = Column(String(20), nullable=False)
-    entry_parent_id = Column(Integer, ForeignKey("entries.entry_id"), nullable=True)
+    entry_parent_id = Column(Integer, nullable=True)
     entry_posted_by_user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
-    topic_id = Column(Integer, ForeignKey("topics.topic_id"), nullable=False)
+    topic_id = Column(Integer, nullable=False)
     
     # Relationships
     author = relationship("User", back_populates="entries")
     topic = relationship("Topic", back_populates="entries")
-    parent = relationship("Entry", remote_side=[entry_id])
+    # Replies always live in the same semester as their parent. There is no
+    # self-referencing FK on the partitioned table (it would have to be checked
+    # when detaching a partition), so this join is declared by hand.
+    parent = relationship(
+        "Entry",
+        primaryjoin="and_(foreign(Entry.entry_parent_id) == remote(Entry.entry_id), "
+                    "Entry.semester == remote(Entry.semester))",
+        viewonly=True
+    )
 
 class Login(Base):
     __tablename__ = "login"
@@ -86,4 +107,9 @@ class Login(Base):
     
     # Relationships
     user = relationship("User", back_populates="login")
-    
\ No newline at end of file
+
+class ArchivedSemester(Base):
+    __tablename__ = "archived_semesters"
+    
+    semester = Column(String(10), primary_key=True)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -4,11 +4,16 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from app.database import get_db
 from app.models import Course, Topic, Entry, User, Enrollment
+from app.utils.partitioning import get_archived_semesters, get_report_tables, get_semester_tables, history_table
 from datetime import datetime, timedelta
 import json
 
 router = APIRouter()
 
+def get_course_semester(db: Session, course_id: int):
+    """Semester of a course, used to prune entries/topics to one partition"""
+    return db.query(Course.semester).filter(Course.course_id == course_id).scalar()
+
 @router.get("/course-stats")
 async def get_course_stats(db: Session = Depends(get_db)):
     """Get overall course statistics"""
@@ -16,32 +21,35 @@ async def get_course_stats(db: Session = Depends(get_db)):
     # Total courses
     total_courses = db.query(Course).count()
     
+    # Archived semesters are included through the history views
+    entries, topics = get_report_tables(db)
+    
     # Active topics per course
     topic_stats = db.query(
         Course.course_name,
-        func.count(Topic.topic_id).label('topic_count')
-    ).select_from(Course).join(Topic, Course.course_id == Topic.course_id).filter(
-        Topic.topic_state == 'active'
+        func.count(topics.c.topic_id).label('topic_count')
+    ).select_from(Course).join(topics, Course.course_id == topics.c.course_id).filter(
+        topics.c.topic_state == 'active'
     ).group_by(Course.course_name).all()
     
     # Discussion activity per course
     activity_stats = db.query(
         Course.course_name,
-        func.count(Entry.entry_id).label('entry_count')
-    ).select_from(Course).join(Topic, Course.course_id == Topic.course_id).join(
-        Entry, Topic.topic_id == Entry.topic_id
+        func.count(entries.c.entry_id).label('entry_count')
+    ).select_from(Course).join(topics, Course.course_id == topics.c.course_id).join(
+        entries, and_(topics.c.topic_id == entries.c.topic_id, topics.c.semester == entries.c.semester)
     ).filter(
-        Entry.entry_state == 'active'
+        entries.c.entry_state == 'active'
     ).group_by(Course.course_name).all()
     
     # Student participation per course
     participation_stats = db.query(
         Course.course_name,
-        func.count(func.distinct(Entry.entry_posted_by_user_id)).label('active_students')
-    ).select_from(Course).join(Topic, Course.course_id == Topic.course_id).join(
-        Entry, Topic.topic_id == Entry.topic_id
-    ).join(User, Entry.entry_posted_by_user_id == User.user_id).filter(
-        Entry.entry_state == 'active',
+        func.count(func.distinct(entries.c.entry_posted_by_user_id)).label('active_students')
+    ).select_from(Course).join(topics, Course.course_id == topics.c.course_id).join(
+        entries, and_(topics.c.topic_id == entries.c.topic_id, topics.c.semester == entries.c.semester)
+    ).join(User, entries.c.entry_posted_by_user_id == User.user_id).filter(
+        entries.c.entry_state == 'active',
         User.user_state == 'registered'
     ).group_by(Course.course_name).all()
     
@@ -56,17 +64,31 @@ async def get_course_stats(db: Session = Depends(get_db)):
 async def get_discussion_timeline(course_id: int = None, db: Session = Depends(get_db)):
     """Get discussion activity timeline"""
     
-    query = db.query(
-        func.date(Entry.entry_created_at).label('date'),
-        func.count(Entry.entry_id).label('post_count')
-    ).filter(Entry.entry_state == 'active')
-    
-    if course_id:
-        query = query.select_from(Entry).join(Topic, Entry.topic_id == Topic.topic_id).filter(
-            Topic.course_id == course_id
-        )
-    
-    timeline = query.group_by(func.date(Entry.entry_created_at)).order_by('date').all()
+    if not course_id:
+        entries, _ = get_report_tables(db)
+        timeline = db.query(
+            func.date(entries.c.entry_created_at).label('date'),
+            func.count(entries.c.entry_id).label('post_count')
+        ).filter(entries.c.entry_state == 'active').group_by(
+            func.date(entries.c.entry_created_at)
+        ).order_by('date').all()
+        return [{"date": str(date), "posts": count} for date, count in timeline]
+    
+    # Archived semesters are read from their own tables
+    semester = get_course_semester(db, course_id)
+    entries, topics = get_semester_tables(db, semester)
+    
+    timeline = db.query(
+        func.date(entries.c.entry_created_at).label('date'),
+        func.count(entries.c.entry_id).label('post_count')
+    ).select_from(entries).join(
+        topics, and_(entries.c.topic_id == topics.c.topic_id, entries.c.semester == topics.c.semester)
+    ).filter(
+        entries.c.entry_state == 'active',
+        topics.c.course_id == course_id,
+        topics.c.semester == semester,
+        entries.c.semester == semester
+    ).group_by(func.date(entries.c.entry_created_at)).order_by('date').all()
     
     return [{"date": str(date), "posts": count} for date, count in timeline]
 
@@ -83,25 +105,31 @@ async def get_student_engagement(course_id: int, db: Session = Depends(get_db)):
         Enrollment.enrollment_state == 'active'
     ).all()
     
+    semester = get_course_semester(db, course_id)
+    entries, topics = get_semester_tables(db, semester)
     engagement_data = []
     
     for student in students:
         # Count posts by student in this course
-        post_count = db.query(Entry).select_from(Entry).join(
-            Topic, Entry.topic_id == Topic.topic_id
+        post_count = db.query(func.count(entries.c.entry_id)).select_from(entries).join(
+            topics, and_(entries.c.topic_id == topics.c.topic_id, entries.c.semester == topics.c.semester)
         ).filter(
-            Topic.course_id == course_id,
-            Entry.entry_posted_by_user_id == student.user_id,
-            Entry.entry_state == 'active'
-        ).count()
+            topics.c.course_id == course_id,
+            topics.c.semester == semester,
+            entries.c.semester == semester,
+            entries.c.entry_posted_by_user_id == student.user_id,
+            entries.c.entry_state == 'active'
+        ).scalar() or 0
         
         # Count topics student has participated in
-        topic_count = db.query(func.count(func.distinct(Topic.topic_id))).select_from(Topic).join(
-            Entry, Topic.topic_id == Entry.topic_id
+        topic_count = db.query(func.count(func.distinct(topics.c.topic_id))).select_from(topics).join(
+            entries, and_(topics.c.topic_id == entries.c.topic_id, topics.c.semester == entries.c.semester)
         ).filter(
-            Topic.course_id == course_id,
-            Entry.entry_posted_by_user_id == student.user_id,
-            Entry.entry_state == 'active'
+            topics.c.course_id == course_id,
+            topics.c.semester == semester,
+            entries.c.semester == semester,
+            entries.c.entry_posted_by_user_id == student.user_id,
+            entries.c.entry_state == 'active'
         ).scalar() or 0
         
         engagement_data.append({
@@ -114,14 +142,36 @@ async def get_student_engagement(course_id: int, db: Session = Depends(get_db)):
     return sorted(engagement_data, key=lambda x: x['engagement_score'], reverse=True)
 
 @router.get("/thread-analysis/{topic_id}")
-async def get_thread_analysis(topic_id: int, db: Session = Depends(get_db)):
+async def get_thread_analysis(topic_id: int, semester: str = None, db: Session = Depends(get_db)):
     """Analyze discussion thread structure"""
     
+    # Topic ids are unique across semesters (the loader enforces it), so the
+    # semester is only needed to pick a partition
+    if semester is None:
+        semester = db.query(Topic.semester).filter(Topic.topic_id == topic_id).order_by(
+            Topic.semester.desc()
+        ).limit(1).scalar()
+    if semester is None and get_archived_semesters(db):
+        topics_history = history_table(Topic.__table__)
+        semester = db.query(topics_history.c.semester).filter(
+            topics_history.c.topic_id == topic_id
+        ).order_by(topics_history.c.semester.desc()).limit(1).scalar()
+    
     # Get all entries for the topic
-    entries = db.query(Entry).filter(
-        Entry.topic_id == topic_id,
-        Entry.entry_state == 'active'
-    ).order_by(Entry.entry_created_at).all()
+    entries_table, _ = get_semester_tables(db, semester)
+    entries = db.query(
+        entries_table.c.entry_id,
+        entries_table.c.entry_created_at,
+        entries_table.c.entry_parent_id,
+        entries_table.c.entry_posted_by_user_id,
+        User.user_name
+    ).select_from(entries_table).join(
+        User, entries_table.c.entry_posted_by_user_id == User.user_id
+    ).filter(
+        entries_table.c.topic_id == topic_id,
+        entries_table.c.semester == semester,
+        entries_table.c.entry_state == 'active'
+    ).order_by(entries_table.c.entry_created_at).all()
     
     # Build thread structure
     thread_data = {
@@ -134,7 +184,7 @@ async def get_thread_analysis(topic_id: int, db: Session = Depends(get_db)):
                 "entry_id": e.entry_id,
                 "created_at": e.entry_created_at.isoformat(),
                 "parent_id": e.entry_parent_id,
-                "author": e.author.user_name
+                "author": e.user_name
             } for e in entries
         ]
     }
@@ -2,6 +2,7 @@ import pandas as pd
 from sqlalchemy.orm import Session
 from app.models import User, Course, Enrollment, Topic, Entry, Login
 from app.database import engine, Base
+from app.utils.partitioning import ensure_semester_partitions, get_archived_semesters, get_report_tables
 from datetime import datetime
 import os
 import numpy as np
@@ -75,6 +76,12 @@ def load_excel_data():
         except Exception as e:
             print(f"Error loading courses: {e}")
         
+        # Topics and entries are stored per semester, so every semester
+        # needs its partition before rows can go in
+        course_semesters = dict(session.query(Course.course_id, Course.semester).all())
+        archived_semesters = get_archived_semesters(session)
+        ensure_semester_partitions(session, set(course_semesters.values()))
+        
         # 3. Load Enrollment
         print("Loading enrollment...")
         try:
@@ -106,12 +113,32 @@ def load_excel_data():
             print(f"Error loading login: {e}")
         
         # 5. Load Topics
+        # Topic and entry ids are treated as unique across semesters,
+        # archived ones included (the API looks threads up by topic_id alone),
+        # so a row whose id already exists under another semester is skipped.
         print("Loading topics...")
         try:
+            _, topics_table = get_report_tables(session)
+            topic_semesters = dict(session.query(topics_table.c.topic_id, topics_table.c.semester).all())
             topics_df = pd.read_excel(f"{data_dir}/topics.xlsx")
+            loaded = skipped_archived = skipped_other = 0
             for _, row in topics_df.iterrows():
+                topic_id = int(row['topic_id'])
+                semester = course_semesters.get(int(row['course_id']))
+                if semester in archived_semesters:
+                    skipped_archived += 1
+                    continue
+                if semester is None:
+                    print(f"Warning: topic {topic_id} refers to unknown course {int(row['course_id'])}")
+                    skipped_other += 1
+                    continue
+                if topic_semesters.setdefault(topic_id, semester) != semester:
+                    print(f"Warning: topic {topic_id} already exists in semester {topic_semesters[topic_id]}")
+                    skipped_other += 1
+                    continue
                 topic = Topic(
-                    topic_id=int(row['topic_id']),
+                    topic_id=topic_id,
+                    semester=semester,
                     topic_title=str(row['topic_title']),
                     topic_content=str(row['topic_content']),
                     topic_created_at=parse_datetime(row['topic_created_at']),
@@ -121,27 +148,73 @@ def load_excel_data():
                     topic_posted_by_user_id=int(row['topic_posted_by_user_id'])
                 )
                 session.merge(topic)
-            print(f"Loaded {len(topics_df)} topics")
+                loaded += 1
+            print(f"Loaded {loaded} topics (skipped {skipped_archived} in archived semesters, "
+                  f"{skipped_other} with unknown courses or conflicting ids)")
         except Exception as e:
             print(f"Error loading topics: {e}")
         
         # 6. Load Entries
         print("Loading entries...")
         try:
+            entries_table, topics_table = get_report_tables(session)
+            topic_semesters = dict(session.query(topics_table.c.topic_id, topics_table.c.semester).all())
+            existing_entries = dict(session.query(entries_table.c.entry_id, entries_table.c.semester).all())
+            entry_semesters = dict(existing_entries)
             entries_df = pd.read_excel(f"{data_dir}/entries.xlsx")
+            loaded = skipped_archived = skipped_other = 0
+            pending = {}
             for _, row in entries_df.iterrows():
+                entry_id = int(row['entry_id'])
+                topic_id = int(row['topic_id'])
+                semester = topic_semesters.get(topic_id)
+                if semester in archived_semesters:
+                    skipped_archived += 1
+                    continue
+                if semester is None:
+                    print(f"Warning: entry {entry_id} refers to unknown topic {topic_id}")
+                    skipped_other += 1
+                    continue
+                if entry_semesters.setdefault(entry_id, semester) != semester:
+                    print(f"Warning: entry {entry_id} already exists in semester {entry_semesters[entry_id]}")
+                    skipped_other += 1
+                    continue
+                parent_id = int(row['entry_parent_id']) if pd.notna(row['entry_parent_id']) and row['entry_parent_id'] != 'NA' else None
+                pending[entry_id] = (row, topic_id, semester, parent_id)
+            
+            # Replies must have their parent in the same semester; there is no
+            # FK on the live table to check it. Repeat so that replies to a
+            # dropped reply are dropped as well.
+            orphans = True
+            while orphans:
+                orphans = [
+                    entry_id for entry_id, (_, _, semester, parent_id) in pending.items()
+                    if parent_id is not None and entry_semesters.get(parent_id) != semester
+                ]
+                for entry_id in orphans:
+                    print(f"Warning: entry {entry_id} replies to entry {pending[entry_id][3]}, "
+                          f"which is missing or in another semester")
+                    skipped_other += 1
+                    del pending[entry_id]
+                    if entry_id not in existing_entries:
+                        del entry_semesters[entry_id]
+            
+            for entry_id, (row, topic_id, semester, parent_id) in pending.items():
                 entry = Entry(
-                    entry_id=int(row['entry_id']),
+                    entry_id=entry_id,
+                    semester=semester,
                     entry_content=str(row['entry_content']),
                     entry_created_at=parse_datetime(row['entry_created_at']),
                     entry_deleted_at=parse_datetime(row['entry_deleted_at']) if row['entry_deleted_at'] != 'NA' else None,
                     entry_state=str(row['entry_state']),
-                    entry_parent_id=int(row['entry_parent_id']) if pd.notna(row['entry_parent_id']) and row['entry_parent_id'] != 'NA' else None,
+                    entry_parent_id=parent_id,
                     entry_posted_by_user_id=int(row['entry_posted_by_user_id']),
-                    topic_id=int(row['topic_id'])
+                    topic_id=topic_id
                 )
                 session.merge(entry)
-            print(f"Loaded {len(entries_df)} entries")
+                loaded += 1
+            print(f"Loaded {loaded} entries (skipped {skipped_archived} in archived semesters, "
+                  f"{skipped_other} with unknown topics or parents, or conflicting ids)")
         except Exception as e:
             print(f"Error loading entries: {e}")
         
@@ -0,0 +1,241 @@
+import argparse
+import hashlib
+import re
+from datetime import datetime
+from sqlalchemy import Column, MetaData, Table, PrimaryKeyConstraint, text
+from sqlalchemy.orm import Session
+from app.models import Course, Topic, Entry, ArchivedSemester
+from app.database import engine, Base
+
+# Tables split by semester, in the order they have to be archived
+# (entries reference topics, so they go first).
+PARTITIONED_TABLES = [Entry.__table__, Topic.__table__]
+
+def partition_name(table_name, semester):
+    """Name of the per-semester table, e.g. entries_2024_07_1a2b3c4d
+
+    The slug keeps names readable; the hash of the raw semester keeps them
+    unique, since "2024/07" and "2024-07" slug to the same thing.
+    """
+    semester = str(semester)
+    slug = re.sub(r"[^a-z0-9]+", "_", semester.lower()).strip("_")
+    digest = hashlib.sha1(semester.encode("utf-8")).hexdigest()[:8]
+    return f"{table_name}_{slug}_{digest}" if slug else f"{table_name}_{digest}"
+
+def semester_table(table, semester, metadata=None):
+    """Table object for a semester's archived copy of entries or topics"""
+    return Table(
+        partition_name(table.name, semester), metadata or MetaData(),
+        *[Column(c.name, c.type, nullable=c.nullable) for c in table.columns],
+        PrimaryKeyConstraint(*[c.name for c in table.primary_key.columns]),
+    )
+
+def history_table(table):
+    """Table object for the entries_history / topics_history view"""
+    return Table(
+        f"{table.name}_history", MetaData(),
+        *[Column(c.name, c.type) for c in table.columns],
+    )
+
+def is_postgres(bind):
+    return bind.dialect.name == "postgresql"
+
+def get_archived_semesters(session):
+    """Semesters that have been moved out of the live tables"""
+    return {row.semester for row in session.query(ArchivedSemester).all()}
+
+def is_archived(session, semester):
+    return session.query(ArchivedSemester).filter(ArchivedSemester.semester == semester).first() is not None
+
+def get_semester_tables(session, semester):
+    """(entries, topics) tables holding a semester's rows.
+
+    Live semesters are read from the partitioned tables, archived ones from
+    their per-semester tables, so both stay a single-partition scan.
+    """
+    if semester is not None and is_archived(session, semester):
+        metadata = MetaData()
+        return (semester_table(Entry.__table__, semester, metadata),
+                semester_table(Topic.__table__, semester, metadata))
+    return Entry.__table__, Topic.__table__
+
+def get_report_tables(session):
+    """(entries, topics) covering every semester, for cross-course reports.
+
+    Once anything is archived this is the *_history views, which union the
+    live tables with the archived per-semester tables.
+    """
+    if get_archived_semesters(session):
+        return history_table(Entry.__table__), history_table(Topic.__table__)
+    return Entry.__table__, Topic.__table__
+
+def ensure_semester_partitions(session, semesters):
+    """Create Postgres list partitions for the given semesters.
+
+    Rows for semesters without a partition land in the default partition.
+    On SQLite the live tables are not split, so this is a no-op there.
+    """
+    conn = session.connection()
+    if not is_postgres(conn):
+        return
+
+    # create_all() leaves tables from before partitioning untouched
+    for table in PARTITIONED_TABLES:
+        partitioned = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"
+        ), {"name": f'"{table.name}"'}).scalar()
+        if not partitioned:
+            raise RuntimeError(
+                f"Table {table.name} is not partitioned by semester; it was created by an "
+                f"older version and has to be rebuilt or migrated before loading data"
+            )
+
+    archived = get_archived_semesters(session)
+    for table in PARTITIONED_TABLES:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{table.name}_default" PARTITION OF "{table.name}" DEFAULT'
+        ))
+        for semester in sorted(set(semesters) - archived):
+            name = partition_name(table.name, semester)
+            if conn.execute(text("SELECT to_regclass(:name)"), {"name": f'"{name}"'}).scalar():
+                continue
+            conn.execute(
+                text(f'CREATE TABLE "{name}" PARTITION OF "{table.name}" FOR VALUES IN (:semester)')
+                .bindparams(semester=semester)
+            )
+
+def _check_partition_bound(conn, table_name, name, semester):
+    """Make sure `name` is the partition of `table_name` holding exactly `semester`"""
+    bound = conn.execute(text(
+        "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c "
+        "JOIN pg_inherits i ON i.inhrelid = c.oid "
+        "WHERE c.oid = to_regclass(:name) AND i.inhparent = to_regclass(:parent)"
+    ), {"name": f'"{name}"', "parent": f'"{table_name}"'}).scalar()
+    if bound is None:
+        raise ValueError(f"No partition {name} for semester {semester!r}")
+
+    expected = "FOR VALUES IN ('{}')".format(str(semester).replace("'", "''"))
+    if bound != expected:
+        raise ValueError(f"Partition {name} has bound {bound}, expected {expected}")
+
+def _drop_topic_foreign_keys(conn, table_name):
+    """Drop the FK a detached entries partition keeps to the live topics table"""
+    names = conn.execute(text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = to_regclass(:name) AND confrelid = to_regclass(:topics) AND contype = 'f'"
+    ), {"name": f'"{table_name}"', "topics": f'"{Topic.__tablename__}"'}).scalars().all()
+    for conname in names:
+        conn.execute(text(f'ALTER TABLE "{table_name}" DROP CONSTRAINT "{conname}"'))
+
+def _archive_postgres(conn, semester):
+    """Detach the semester's partitions into standalone tables"""
+    entries_name = partition_name(Entry.__tablename__, semester)
+    topics_name = partition_name(Topic.__tablename__, semester)
+
+    for table in PARTITIONED_TABLES:
+        _check_partition_bound(conn, table.name, partition_name(table.name, semester), semester)
+
+    for table in PARTITIONED_TABLES:
+        name = partition_name(table.name, semester)
+        # The detached entries table still points at the live topics table,
+        # which would block detaching the topics partition.
+        conn.execute(text(f'ALTER TABLE "{table.name}" DETACH PARTITION "{name}"'))
+        if table is Entry.__table__:
+            _drop_topic_foreign_keys(conn, name)
+
+    # Re-link the archived tables to each other. Live entries have no parent
+    # FK, so that one is NOT VALID: rows loaded before the loader checked
+    # parents must not make a semester impossible to archive.
+    conn.execute(text(
+        f'ALTER TABLE "{entries_name}" ADD FOREIGN KEY (topic_id, semester) '
+        f'REFERENCES "{topics_name}" (topic_id, semester)'
+    ))
+    conn.execute(text(
+        f'ALTER TABLE "{entries_name}" ADD FOREIGN KEY (entry_parent_id, semester) '
+        f'REFERENCES "{entries_name}" (entry_id, semester) NOT VALID'
+    ))
+
+def _archive_sqlite(conn, semester):
+    """Move the semester's rows into their own per-semester tables"""
+    metadata = MetaData()
+    for table in PARTITIONED_TABLES:
+        archive = semester_table(table, semester, metadata)
+        archive.create(conn, checkfirst=True)
+        conn.execute(archive.insert().from_select(
+            [c.name for c in table.columns],
+            table.select().where(table.c.semester == semester),
+        ))
+        conn.execute(table.delete().where(table.c.semester == semester))
+
+def refresh_history_views(session):
+    """(Re)create entries_history / topics_history over live + archived data"""
+    conn = session.connection()
+    archived = sorted(get_archived_semesters(session))
+    for table in PARTITIONED_TABLES:
+        columns = ", ".join(f'"{c.name}"' for c in table.columns)
+        sources = [table.name] + [partition_name(table.name, s) for s in archived]
+        view = f"{table.name}_history"
+        conn.execute(text(f'DROP VIEW IF EXISTS "{view}"'))
+        conn.execute(text(
+            f'CREATE VIEW "{view}" AS '
+            + " UNION ALL ".join(f'SELECT {columns} FROM "{source}"' for source in sources)
+        ))
+
+def archive_semester(session, semester):
+    """Take a closed semester out of the live entries/topics tables.
+
+    On Postgres the semester's partitions are detached; on SQLite its rows are
+    moved into per-semester tables. Either way the data stays readable through
+    get_semester_tables() and the entries_history / topics_history views.
+    """
+    if session.query(Course).filter(Course.semester == semester).first() is None:
+        raise ValueError(f"Unknown semester {semester!r}")
+    if is_archived(session, semester):
+        raise ValueError(f"Semester {semester!r} is already archived")
+
+    conn = session.connection()
+    if is_postgres(conn):
+        _archive_postgres(conn, semester)
+    else:
+        _archive_sqlite(conn, semester)
+
+    session.add(ArchivedSemester(semester=semester, archived_at=datetime.utcnow()))
+    session.flush()
+    refresh_history_views(session)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive closed semesters")
+    parser.add_argument("semesters", nargs="*", help="semesters to archive, exactly as in courses.semester")
+    parser.add_argument("--list", action="store_true", help="show live and archived semesters")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    session = Session(bind=engine)
+
+    try:
+        if args.list:
+            archived = get_archived_semesters(session)
+            semesters = {s for (s,) in session.query(Course.semester).distinct()}
+            for semester in sorted(semesters | archived):
+                print(f"{semester}\t{'archived' if semester in archived else 'live'}")
+            return
+
+        for semester in args.semesters:
+            print(f"Archiving semester {semester}...")
+            archive_semester(session, semester)
+        session.commit()
+
+        if args.semesters and not is_postgres(engine):
+            # Give the space freed in the live tables back to the filesystem
+            with engine.connect() as conn:
+                conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        print(f"Archived {len(args.semesters)} semester(s)")
+    except Exception as e:
+        session.rollback()
+        print(f"Error archiving semesters: {e}")
+        raise e
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()